@@ -2,49 +2,452 @@
 import os  # For interacting with the file system paths, directories)
 import subprocess  # For running external commands like BLAST from within Python
 import tempfile  # For creating temporary files for storing intermediate BLAST results
+import shutil  # For removing scratch directories left behind by MMseqs2
 import argparse  # For parsing command-line arguments provided by the user
+from concurrent.futures import ThreadPoolExecutor  # For running several BLAST searches at once
 import time # tracking how long script takes
+import glob  # For locating the index files that make up a BLAST database
+import csv  # For parsing sourmash search results in sketch mode
+import hashlib  # For fingerprinting query files in the result cache
+
+# Tabular output columns requested from blastn (-outfmt 6). Built once at
+# module level so the per-call hot path reuses the same string object
+_OUTFMT = "6 qseqid sseqid pident length mismatch gapopen qstart qend sstart send evalue bitscore"
+
+# MMseqs2's spelling of the same 12 columns
+_MMSEQS_OUTFMT = "query,target,pident,alnlen,mismatch,gapopen,qstart,qend,tstart,tend,evalue,bits"
+
+# Fixed arguments shared by every blastn invocation; only the query, database
+# and thread count vary per call
+_BLASTN_ARGS = (
+    "-outfmt", _OUTFMT,  # Custom tabular output format
+    "-evalue", "0.001",  # E-value threshold for significance
+    "-max_target_seqs", "1",  # Only keep the top hit; prunes work during the search, unlike -num_alignments which only trims the report
+    "-max_hsps", "1",  # One HSP per subject is all the top-identity call needs
+    "-culling_limit", "1",  # Discard alignments enveloped by a better-scoring one
+)
+
+# Fixed arguments shared by every MMseqs2 invocation
+_MMSEQS_ARGS = (
+    "--search-type", "3",  # Nucleotide-nucleotide search
+    "--format-output", _MMSEQS_OUTFMT,  # Match blastn's -outfmt 6 columns
+    "-e", "0.001",  # E-value threshold for significance
+    "--max-seqs", "1",  # Only keep the top hit
+)
+
+# MinHash parameters used for every sourmash sketch in sketch mode
+_SKETCH_PARAMS = "k=31,scaled=1000"
+
+# Define a function to merge every sample FASTA into one multi-FASTA query
+def build_merged_query(fasta_directory, include_files=None):
+    """
+    Concatenate .fa files from a directory into a single multi-FASTA file.
+
+    BLAST startup and database loading are paid once per invocation, so
+    searching one merged query file per database is far cheaper than
+    launching blastn separately for every sample. Each sequence header is
+    prefixed with a short sample tag (e.g. 'S0|') so every qseqid in the
+    BLAST output can be traced back to the file it came from. A plain tag
+    is used instead of the filename itself because qseqid is cut at the
+    first whitespace and several sample filenames contain spaces.
+
+    Files may hold any number of records; every record in a file gets the
+    file's tag. Lines are copied through as-is, so sequences are never
+    assembled into Python strings no matter how large the inputs are.
+
+    Parameters:
+    fasta_directory (str): Directory containing the sample FASTA files
+    include_files (set): Optional subset of filenames to merge; files keep
+        the same tag they get when the whole directory is merged
+
+    Returns:
+    tuple: (path to merged query file, dict mapping sample tag -> filename)
+    """
+    # Maps each generated sample tag back to the original filename
+    tag_to_file = {}
+
+    # Counts every .fa file seen, so tags stay stable even when only a
+    # subset of the directory is being merged
+    file_index = 0
+
+    # Enumerate the .fa files with os.scandir: DirEntry carries the joined
+    # path along with the name, saving an os.path.join per file. Sort so
+    # sample tags are assigned deterministically across runs
+    with os.scandir(fasta_directory) as entries:
+        fasta_entries = sorted(
+            (entry for entry in entries if entry.name.endswith(".fa")),
+            key=lambda entry: entry.name,
+        )
+
+    # Create the merged query file; 'delete=False' so BLAST can open it by path
+    with tempfile.NamedTemporaryFile(delete=False, mode="w", suffix=".fa") as merged:
+        for entry in fasta_entries:
+            fasta_file = entry.name
+
+            # Assign this file's tag from its position in the sorted listing
+            tag = f"S{file_index}"
+            file_index += 1
+
+            # Skip files outside the requested subset (tag already consumed)
+            if include_files is not None and fasta_file not in include_files:
+                continue
+
+            tag_to_file[tag] = fasta_file
+
+            # Copy the file into the merged query, tagging each header line
+            with open(entry.path) as f:
+                line = ""
+                for line in f:
+                    if line.startswith(">"):
+                        merged.write(f">{tag}|{line[1:].lstrip()}")
+                    else:
+                        merged.write(line)
+
+                # Guard against files missing a trailing newline, which would
+                # otherwise glue the next file's header onto this sequence
+                if line and not line.endswith("\n"):
+                    merged.write("\n")
+
+        return merged.name, tag_to_file
+
+# Define a function to split batched BLAST output back into per-sample results
+def group_hits_by_tag(blast_lines):
+    """
+    Reduce batched BLAST tabular output to the best hit per sample.
+
+    Only the first (highest-scoring) line per query is kept, so memory
+    stays at one line per sample no matter how much output the search
+    produces. The sample tag prepended by build_merged_query is stripped
+    off again, so the stored line looks exactly as it would have if the
+    sample had been BLASTed on its own.
+
+    A sample file may hold several records (e.g. multiple contigs of one
+    assembly); they all carry the same tag, so the winner is the best hit
+    across every record in the file.
+
+    Parameters:
+    blast_lines (iterable): Lines of BLAST tabular output for the merged query
+
+    Returns:
+    dict: sample tag -> best tabular result line for that sample
+    """
+    best = {}
+    for line in blast_lines:
+        # qseqid is 'tag|original_id'; split the tag back off
+        tag, _, rest = line.partition("|")
+
+        # Keep whichever of the sample's records matched best
+        identity, _ = parse_blast_result(rest)
+        if identity is not None and (tag not in best or identity > best[tag][0]):
+            best[tag] = (identity, rest)
+    return {tag: hit_line for tag, (_, hit_line) in best.items()}
+
+# Define a function to fingerprint a file's contents for the result cache
+def file_digest(path):
+    """
+    Fingerprint a file's contents for use in cache entry names.
+
+    Parameters:
+    path (str): File to fingerprint
+
+    Returns:
+    str: Hex digest of the file's bytes
+    """
+    # Hash in chunks; blake2b is fast and collision-safe
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Define a function to locate a sample's entry in the on-disk result cache
+def result_cache_path(cache_dir, sample_digest, db_file, aligner):
+    """
+    Build the cache path for a (sample contents, database, engine) triple.
+
+    Each sample file gets its own entry per database, so a rerun after
+    adding one new FASTA only searches that sample; everything else is
+    served from the cache. Keying the sample by content digest means
+    renaming a file still hits, while editing it forces a fresh search.
+
+    Parameters:
+    cache_dir (str): Directory holding cached result files
+    sample_digest (str): Content digest of the sample file (file_digest)
+    db_file (str): Path to the reference database
+    aligner (str): Search engine the result came from
+
+    Returns:
+    str: Path of the cache file for this (sample, database) pair
+    """
+    # Key the database by a digest of its full path, not its basename, so
+    # databases in different directories that share a name (refs/v1/db vs
+    # refs/v2/db) cannot be served from each other's entries
+    db_key = hashlib.blake2b(os.path.abspath(db_file).encode(), digest_size=8).hexdigest()
+    return os.path.join(cache_dir, f"{sample_digest}.{db_key}.{aligner}.tsv")
+
+# Define a function to read a sample's cached best hit, if still valid
+def read_cached_hit(cache_path, db_file):
+    """
+    Return a sample's cached best-hit line when the entry is still fresh.
+
+    Parameters:
+    cache_path (str): Entry path from result_cache_path
+    db_file (str): Path to the reference database, for staleness checking
+
+    Returns:
+    str: The cached best-hit line, '' if that search found no hit, or
+        None when the entry is missing or older than the database files
+        (i.e. a cache miss)
+    """
+    try:
+        cache_mtime = os.path.getmtime(cache_path)
+    except OSError:
+        return None
+
+    # An entry older than any file making up the database may be stale;
+    # treat it as a miss so rebuilt references force a fresh search
+    db_mtime = max((os.path.getmtime(path) for path in glob.glob(db_file + "*")), default=0.0)
+    if cache_mtime < db_mtime:
+        return None
+
+    with open(cache_path, "r") as f:
+        return f.read().rstrip("\n")
+
+# Define a function to store a sample's best hit in the result cache
+def write_cached_hit(cache_path, hit_line):
+    """
+    Store a sample's best-hit line ('' when the search found no hit).
+
+    The entry is written to a uniquely named temp file and renamed into
+    place, so concurrent searches never interleave writes and an
+    interrupted run can never leave a truncated entry behind.
+
+    Parameters:
+    cache_path (str): Entry path from result_cache_path
+    hit_line (str): Best tabular result line, or '' for a searched
+        sample that produced no hit
+    """
+    pending_fd, pending_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+    with os.fdopen(pending_fd, "w") as cache_file:
+        if hit_line:
+            cache_file.write(hit_line + "\n")
+    os.replace(pending_path, cache_path)
+
+# Define a function to pull a BLAST database's index files into the page cache
+def warm_database(db_path):
+    """
+    Read a database's index files once so the OS caches them in RAM.
+
+    The first search against a cold database pays disk latency while
+    blastn mmaps and faults in the index (.nhr/.nin/.nsq and friends).
+    Reading the files sequentially beforehand is the cheapest way to get
+    them resident, so the actual search starts hot. Harmless if the files
+    are already cached or the database lives on fast local storage.
+
+    Parameters:
+    db_path (str): Path to the BLAST database (basename without extension)
+    """
+    for index_file in glob.glob(db_path + ".*"):
+        with open(index_file, "rb") as f:
+            # Read in 1 MiB chunks; the data itself is discarded
+            while f.read(1024 * 1024):
+                pass
 
 # Define a function to run a BLASTn search
-def run_blast(query_file, db_file):
+def run_blast(query_file, db_file, threads=None, aligner="blastn"):
     """
-    Run BLAST search and return results as a string.
+    Run a sequence search and return results as a string.
 
     Parameters:
     query_file (str): Path to the query FASTA file
-    db_file (str): Path to the BLAST database
+    db_file (str): Path to the reference database (BLAST-formatted for
+        blastn; a FASTA file or prebuilt MMseqs2 database for mmseqs2)
+    threads (int): Number of search worker threads (default: all CPU cores)
+    aligner (str): Search engine to use, either 'blastn' or 'mmseqs2'
 
     Returns:
-    str: BLAST results in tabular format
+    iterator: Newline-stripped search result lines in BLAST tabular format,
+        yielded lazily so the full report is never held in memory at once
     """
-    # Create a temporary file to store BLAST output
-    # 'delete=False' prevents it from being auto-deleted so we can read it later
-    # 'mode="w+"' allows reading and writing to the temporary file
-    with tempfile.NamedTemporaryFile(delete=False, mode='w+') as tmp:
-        temp_output = tmp.name  # Store the path to the temp file
-
-    # Construct the BLASTn command with desired parameters
+    if aligner == "mmseqs2":
+        # MMseqs2's k-mer prefilter is much faster than BLAST's seed-and-extend
+        # and emits the same 12-column tabular format, so parsing is unchanged.
+        # easy-search insists on a result file path, so keep a temp file here
+        with tempfile.NamedTemporaryFile(delete=False, mode='w+') as tmp:
+            temp_output = tmp.name  # Store the path to the temp file
+
+        # Scratch directory MMseqs2 requires for its intermediate files
+        mmseqs_tmpdir = tempfile.mkdtemp(prefix="mmseqs_")
+
+        blast_command = [
+            "mmseqs", "easy-search",  # One-shot search without manual DB staging
+            query_file,  # The query FASTA file
+            db_file,  # The reference database (FASTA or mmseqs DB)
+            temp_output,  # Output will be written to the temporary file
+            mmseqs_tmpdir,
+            *_MMSEQS_ARGS,  # Constant output-format and top-hit arguments
+            "--threads", str(threads or os.cpu_count() or 4)  # Parallelize the search across CPU cores
+        ]
+        # Run the search command using subprocess; 'check=True' raises error on failure
+        subprocess.run(blast_command, check=True)
+
+        # Stream the result file back line by line instead of slurping it
+        def stream_results():
+            try:
+                with open(temp_output, "r") as f:
+                    for line in f:
+                        yield line.rstrip("\n")
+            finally:
+                # Delete the temporary file and scratch dir to clean up after ourselves
+                os.remove(temp_output)
+                shutil.rmtree(mmseqs_tmpdir, ignore_errors=True)
+
+        return stream_results()
+
+    # Construct the BLASTn command with desired parameters. No -out argument:
+    # blastn streams tabular output to stdout, which saves a temp-file write,
+    # read-back and delete per invocation
     blast_command = [
         "blastn",  # Use BLASTN for nucleotide-nucleotide comparison
         "-query", query_file,  # The query FASTA file
         "-db", db_file,  # The BLAST-formatted database
-        "-out", temp_output,  # Output will be written to the temporary file
-        "-outfmt", "6 qseqid sseqid pident length mismatch gapopen qstart qend sstart send evalue bitscore",  # Custom tabular output format
-        "-evalue", "0.001",  # E-value threshold for significance
-        "-num_alignments", "1"  # Only keep the top hit
+        *_BLASTN_ARGS,  # Constant output-format and top-hit arguments
+        "-num_threads", str(threads or os.cpu_count() or 4)  # Parallelize the search across CPU cores
     ]
-    # Run the BLAST command using subprocess; 'check=True' raises error on failure
-    subprocess.run(blast_command, check=True)
+    # Launch blastn with its stdout connected to a pipe so results can be
+    # consumed line by line as they are produced
+    process = subprocess.Popen(blast_command, stdout=subprocess.PIPE, text=True)
+
+    # Stream lines from the pipe; raise on failure just like check=True would
+    def stream_results():
+        with process.stdout:
+            for line in process.stdout:
+                yield line.rstrip("\n")
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, blast_command)
+
+    return stream_results()
+
+# Define a function to reduce result files from an external GNU parallel run
+def collect_parallel_results(jobs_manifest, parallel_dir):
+    """
+    Reduce the per-job result files of a GNU parallel run into best hits.
+
+    The manifest written by --emit_jobs lists one search per line as
+    'tag<TAB>species<TAB>query<TAB>db<TAB>filename'; parallel leaves each
+    job's tabular output at parallel_dir/tag.species.tsv. This reads each
+    result file once and keeps the highest-identity line, producing the
+    same structures the in-process search path builds.
+
+    Parameters:
+    jobs_manifest (str): Path to the jobs manifest written by --emit_jobs
+    parallel_dir (str): Directory holding the per-job result files
+
+    Returns:
+    tuple: (dict mapping sample tag -> filename,
+            dict mapping species -> {sample tag -> best result line})
+    """
+    tag_to_file = {}
+    per_species_hits = {}
+
+    with open(jobs_manifest) as manifest:
+        for line in manifest:
+            tag, species, _query, _db, fasta_file = line.rstrip("\n").split("\t")
+            tag_to_file[tag] = fasta_file
+            per_species_hits.setdefault(species, {})
+
+            # A job that produced no output simply means no hit
+            result_path = os.path.join(parallel_dir, f"{tag}.{species}.tsv")
+            if not os.path.exists(result_path):
+                continue
+
+            # Keep the highest-identity line from this job's output
+            best_identity = None
+            best_line = None
+            with open(result_path) as f:
+                for row in f:
+                    row = row.rstrip("\n")
+                    identity, _ = parse_blast_result(row)
+                    if identity is not None and (best_identity is None or identity > best_identity):
+                        best_identity, best_line = identity, row
+
+            if best_line is not None:
+                per_species_hits[species][tag] = best_line
+
+    return tag_to_file, per_species_hits
+
+# Define a function to identify samples by MinHash sketch comparison
+def sketch_identify(fasta_directory, species_refs):
+    """
+    Assign each sample to a species by sourmash sketch containment.
 
-    # Open the temporary output file and read the entire content into a string
-    with open(temp_output, "r") as f:
-        blast_results = f.read()
+    For a species-level call between a handful of references, comparing
+    MinHash sketches is orders of magnitude faster than any alignment:
+    each genome is reduced to a small k-mer sketch and the best-contained
+    reference wins. The containment score (scaled to a percentage) stands
+    in for percent identity in the outputs.
 
-    # Delete the temporary file to clean up after ourselves
-    os.remove(temp_output)
+    Requires the 'sourmash' command on PATH.
+
+    Parameters:
+    fasta_directory (str): Directory containing the sample FASTA files
+    species_refs (dict): species_name -> reference FASTA (sketched here)
+        or a prebuilt .sig signature file (used as-is)
 
-    # Return the BLAST results as a string
-    return blast_results
+    Returns:
+    dict: filename -> (species, containment percentage), with
+        (None, None) for samples no reference matched
+    """
+    # Scratch directory for the signatures and search output
+    workdir = tempfile.mkdtemp(prefix="sketch_")
+
+    try:
+        # Sketch each reference once up front; prebuilt signatures are reused
+        sig_to_species = {}
+        reference_sigs = []
+        for species, ref_path in species_refs.items():
+            if ref_path.endswith(".sig"):
+                sig_path = ref_path
+            else:
+                sig_path = os.path.join(workdir, f"ref_{species}.sig")
+                subprocess.run(["sourmash", "sketch", "dna", "-p", _SKETCH_PARAMS, ref_path, "-o", sig_path, "-q"], check=True)
+            sig_to_species[os.path.abspath(sig_path)] = species
+            reference_sigs.append(sig_path)
+
+        # Enumerate the sample files, sorted for deterministic output order
+        with os.scandir(fasta_directory) as entries:
+            fasta_entries = sorted(
+                (entry for entry in entries if entry.name.endswith(".fa")),
+                key=lambda entry: entry.name,
+            )
+
+        results = {}
+        query_sig = os.path.join(workdir, "query.sig")
+        search_csv = os.path.join(workdir, "search.csv")
+        for entry in fasta_entries:
+            # Sketch the sample, then search it against all reference sketches
+            subprocess.run(["sourmash", "sketch", "dna", "-p", _SKETCH_PARAMS, entry.path, "-o", query_sig, "-q"], check=True)
+            subprocess.run(["sourmash", "search", query_sig, *reference_sigs, "--containment", "-o", search_csv, "-q"], check=True)
+
+            # The search CSV is sorted best-first; only the top row matters
+            with open(search_csv, newline="") as f:
+                top_row = next(csv.DictReader(f), None)
+
+            if top_row is None:
+                results[entry.name] = (None, None)
+            else:
+                # Map the matched signature file back to its species label
+                species = sig_to_species.get(os.path.abspath(top_row["filename"]))
+                results[entry.name] = (species, float(top_row["similarity"]) * 100)
+
+            # Remove per-sample scratch files before the next iteration
+            os.remove(query_sig)
+            os.remove(search_csv)
+
+        return results
+    finally:
+        # Delete the scratch directory to clean up after ourselves
+        shutil.rmtree(workdir, ignore_errors=True)
 
 # Define a function to extract useful information from the BLAST output
 def parse_blast_result(blast_result):
@@ -57,15 +460,24 @@ def parse_blast_result(blast_result):
     Returns:
     tuple: (percent identity, subject ID)
     """
-    # If the BLAST result string is empty or only whitespace, return None
-    if not blast_result.strip():
+    # Only the first line (top hit) matters; partition peels it off without
+    # splitting the whole report into a list of lines
+    first_line, _, _ = blast_result.partition("\n")
+
+    # If the top line is empty or only whitespace, there was no hit
+    if not first_line.strip():
         return None, None
 
-    # Get the top BLAST hit (first line of output), split into columns by tab
-    best_hit = blast_result.strip().split("\n")[0].split("\t")
+    # Locate just the first three tab-separated fields (qseqid, sseqid,
+    # pident) by scanning for tabs, instead of splitting all twelve columns
+    sseqid_start = first_line.find("\t") + 1
+    sseqid_end = first_line.find("\t", sseqid_start)
+    pident_end = first_line.find("\t", sseqid_end + 1)
+    if pident_end == -1:
+        pident_end = len(first_line)
 
     # Return percent identity (as float) and subject ID (as string)
-    return float(best_hit[2]), best_hit[1]
+    return float(first_line[sseqid_end + 1:pident_end]), first_line[sseqid_start:sseqid_end]
 
 # Define the main function to orchestrate the pipeline
 def main():
@@ -75,20 +487,59 @@ def main():
     # Define required input directory containing .fa files
     parser.add_argument("--input_dir", required=True, help="Directory containing FASTA files")
 
-    # Define required BLAST databases, passed as a list of species_name:path_to_db entries
-    parser.add_argument("--databases", required=True, nargs='+', help="Species databases in format species_name:path_to_db")
+    # Define BLAST databases, passed as a list of species_name:path_to_db entries
+    parser.add_argument("--databases", nargs='+', help="Species databases in format species_name:path_to_db")
+
+    # Alternative to --databases: one database holding every reference, with
+    # each sequence ID prefixed 'species|'. A single search then covers all
+    # species at once and the winner is read off the best hit's subject ID
+    parser.add_argument("--combined_db", help="Combined database with 'species|' prefixed sequence IDs (replaces --databases)")
 
     # Optional output directory for storing BLAST results; default is 'blast_results'
     parser.add_argument("--output_dir", default="blast_results", help="Directory for output files")
 
+    # Optional number of BLAST worker threads; default is every available core
+    parser.add_argument("--threads", type=int, default=os.cpu_count(), help="Number of threads for each BLAST search")
+
+    # Optional number of BLAST searches to run concurrently; default keeps
+    # jobs * threads within the machine's core count
+    parser.add_argument("--jobs", type=int, default=None, help="Number of BLAST searches to run concurrently")
+
+    # Optional search engine; MMseqs2 is typically orders of magnitude faster
+    # than BLAST for this top-hit workflow and emits the same tabular format
+    parser.add_argument("--aligner", choices=["blastn", "mmseqs2"], default="blastn", help="Search engine to use")
+
+    # Optional identification method: 'sketch' skips alignment entirely and
+    # compares MinHash sketches with sourmash, which is far faster when only
+    # a species-level call is needed. --databases entries must then point at
+    # reference FASTA files (or prebuilt .sig signatures) instead of BLAST DBs
+    parser.add_argument("--method", choices=["align", "sketch"], default="align", help="Identification method: alignment search or sourmash sketch comparison")
+
+    # Optional offload to GNU parallel (e.g. on a cluster): --emit_jobs writes
+    # a jobs manifest and prints the parallel command to run; --collect then
+    # reduces the per-job result files into the usual summary outputs
+    parser.add_argument("--emit_jobs", action="store_true", help="Write a GNU parallel jobs manifest and the command to run it, then exit")
+    parser.add_argument("--collect", action="store_true", help="Collect the result files of a prior --emit_jobs parallel run instead of searching")
+
+    # Optional early-accept threshold: once a database matches a sample at or
+    # above this identity, later databases skip that sample entirely. List the
+    # most prevalent species first to maximize the savings. Searches run
+    # sequentially in the order given when this is enabled
+    parser.add_argument("--early_accept_threshold", type=float, default=None, help="Percent identity at which a hit is accepted without searching the remaining databases (e.g. 99.0)")
+
     # Parse the arguments provided by the user
     args = parser.parse_args()
 
     # Store the input directory path
     fasta_directory = args.input_dir
 
+    # Exactly one database layout must be supplied
+    if not args.databases and not args.combined_db:
+        parser.error("either --databases or --combined_db is required")
+
     # Parse database inputs into a dictionary mapping species_name → path_to_db
-    species_dbs = dict(pair.split(":") for pair in args.databases)
+    # (empty in combined-database mode, where species come from subject IDs)
+    species_dbs = dict(pair.split(":") for pair in args.databases) if args.databases else {}
 
     # Store the output directory path
     output_dir = args.output_dir
@@ -100,63 +551,304 @@ def main():
     summary_output_file = os.path.join(output_dir, "blast_summary_results.txt")
     species_summary_file = os.path.join(output_dir, "species_summary.txt")
 
+    # Sketch mode needs per-species reference files, not a combined database
+    if args.method == "sketch" and not species_dbs:
+        parser.error("--method sketch requires --databases entries pointing at reference FASTA or .sig files")
+
+    # Paths used when the searches are farmed out to GNU parallel
+    jobs_manifest = os.path.join(output_dir, "jobs.tsv")
+    parallel_dir = os.path.join(output_dir, "parallel_out")
+
+    if args.emit_jobs:
+        # Write one job per (sample, database) and hand the actual searching
+        # to GNU parallel, which spreads the jobs over cores (or, with its
+        # --sshlogin option, over machines) with retries and resume for free
+        if not species_dbs:
+            parser.error("--emit_jobs requires --databases")
+        os.makedirs(parallel_dir, exist_ok=True)
+
+        # Tag samples exactly as the merged query would, so --collect agrees
+        with os.scandir(fasta_directory) as entries:
+            fasta_entries = sorted(
+                (entry for entry in entries if entry.name.endswith(".fa")),
+                key=lambda entry: entry.name,
+            )
+
+        job_count = 0
+        with open(jobs_manifest, "w") as jobs_file:
+            for index, entry in enumerate(fasta_entries):
+                for species, db_path in species_dbs.items():
+                    jobs_file.write(f"S{index}\t{species}\t{entry.path}\t{db_path}\t{entry.name}\n")
+                    job_count += 1
+
+        # Print the command that runs the manifest; single quotes keep the
+        # outfmt string and any paths containing spaces intact
+        blastn_args = " ".join(f"'{arg}'" if " " in arg else arg for arg in _BLASTN_ARGS)
+        print(f"Wrote {job_count} job(s) to {jobs_manifest}. Run them with:\n")
+        print("parallel --colsep '\\t' -j " + str(os.cpu_count() or 4)
+              + " blastn -query {3} -db {4} " + blastn_args
+              + " -out '" + parallel_dir + "/{1}.{2}.tsv' :::: '" + jobs_manifest + "'")
+        print("\nThen rerun with --collect to build the summary files.")
+        return
+
     # *** Start timer
     start_time = time.time()
     # *** Initialize sample counter
     sample_count = 0
 
-    # Open both output files for writing (will be overwritten if they exist)
-    with open(summary_output_file, "w") as summary_file, open(species_summary_file, "w") as species_file:
-        # Write headers to the summary file
-        summary_file.write("BLAST Summary Results\n=====================\n\n")
-        summary_file.write("Query ID\tSubject ID\t% Identity\tAlignment Length\tMismatches\tGap Openings\tQuery Start\tQuery End\tSubject Start\tSubject End\tE-value\tBit Score\n")
+    if args.method == "sketch":
+        # Compare MinHash sketches instead of aligning; the containment score
+        # (as a percentage) takes the place of percent identity
+        matches = sketch_identify(fasta_directory, species_dbs)
+
+        # Open both output files for writing (will be overwritten if they exist).
+        # Binary mode skips the TextIOWrapper encoding layer on every write
+        with open(summary_output_file, "wb", buffering=1024 * 1024) as summary_file, \
+                open(species_summary_file, "wb", buffering=1024 * 1024) as species_file:
+            # Write headers; sketch mode has no alignment columns to report
+            summary_file.write(b"Sketch Summary Results\n======================\n\n")
+            summary_file.write(b"Sample ID\tSpecies\tContainment (%)\n")
+            species_file.write(b"Sample ID\tSpecies Identified\tPercent Identity\n")
+
+            for fasta_file, (species, containment) in matches.items():
+                # If no reference sketch contained this sample at all
+                if species is None:
+                    species_file.write(f"{fasta_file}\tNo Match\tN/A\n".encode())
+                    continue  # Skip to next sample
 
-        # Write headers to the species identification summary file
-        species_file.write("Sample ID\tSpecies Identified\tPercent Identity\n")
+                # Write the best containment match to both outputs
+                species_file.write(f"{fasta_file}\t{species}\t{containment:.3f}\n".encode())
+                summary_file.write(f"{fasta_file}\t{species}\t{containment:.3f}\n".encode())
 
-        # Loop through each file in the input directory
-        for fasta_file in os.listdir(fasta_directory):
-            # Process only files ending in '.fa' (FASTA format)
-            if fasta_file.endswith(".fa"):
-                # Construct the full path to the current query file
-                query_file = os.path.join(fasta_directory, fasta_file)
+                # increment the sample count
+                sample_count += 1
 
-                # Dictionary to store BLAST results for all species for this sample
-                results = {}
+        end_time = time.time()
+        total_time = end_time - start_time
+        print(f"\nProcessed {sample_count} sample(s) in {total_time:.2f} seconds.")
+        return
+
+    if args.collect:
+        # Reduce a completed GNU parallel run instead of searching in-process
+        merged_query = None
+        tag_to_file, per_species_hits = collect_parallel_results(jobs_manifest, parallel_dir)
+    else:
+        # Merge every sample into one multi-FASTA so each database is searched once
+        merged_query, tag_to_file = build_merged_query(fasta_directory)
+
+    # Pick a worker count that keeps jobs * threads within the core count,
+    # so concurrent searches don't oversubscribe the CPU
+    threads = max(1, args.threads or 1)
+    jobs = args.jobs or max(1, (os.cpu_count() or 1) // threads)
+    jobs = min(jobs, max(1, len(species_dbs)))
+
+    # Cache best hits per (sample, database) under the output directory, so
+    # a rerun after adding one new FASTA only searches that sample
+    cache_dir = os.path.join(output_dir, ".cache")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Fingerprint each sample file once; the digests key its cache entries
+    sample_digests = {}
+    if not args.collect:
+        for tag, fasta_file in tag_to_file.items():
+            sample_digests[tag] = file_digest(os.path.join(fasta_directory, fasta_file))
+
+    # Run one batched search over the wanted samples and reduce it to
+    # best-hit-per-sample. Cached samples are served without searching; only
+    # the uncached remainder goes into the query, re-merged the same way the
+    # early-accept path shrinks its query. Grouping happens in the worker
+    # thread so the search's output stream is drained as it is produced
+    def search_database(db_path, wanted=None):
+        if wanted is None:
+            wanted = tag_to_file
+
+        # Serve every sample with a fresh cache entry straight from disk
+        hits = {}
+        uncached = {}
+        for tag, fasta_file in wanted.items():
+            cached = read_cached_hit(result_cache_path(cache_dir, sample_digests[tag], db_path, args.aligner), db_path)
+            if cached is None:
+                uncached[tag] = fasta_file
+            elif cached:
+                hits[tag] = cached
+            # '' means an earlier run searched this sample and found no hit
+
+        if not uncached:
+            return hits
+
+        # Prime the page cache so the search doesn't stall on cold index
+        # reads; only a cache miss pays this cost, so a fully cached rerun
+        # never touches the database files at all
+        warm_database(db_path)
+
+        # Reuse the prebuilt full merged query when every sample needs
+        # searching; otherwise merge just the uncached ones
+        subset_query = None
+        if len(uncached) < len(tag_to_file):
+            subset_query, _ = build_merged_query(fasta_directory, include_files=set(uncached.values()))
+        try:
+            new_hits = group_hits_by_tag(run_blast(subset_query or merged_query, db_path, threads, args.aligner))
+        finally:
+            if subset_query is not None:
+                os.remove(subset_query)
+
+        # Record each freshly searched sample's outcome, no-hit included
+        for tag in uncached:
+            write_cached_hit(result_cache_path(cache_dir, sample_digests[tag], db_path, args.aligner), new_hits.get(tag, ""))
+
+        hits.update(new_hits)
+        return hits
+
+    # Records which samples each database was actually searched with, so the
+    # summary can tell "no hit" apart from "skipped by early accept"
+    searched_tags = {}
+
+    # Best hit per sample against the combined database, when one is in use
+    combined_hits = None
+
+    try:
+        if args.collect:
+            # Results are already on disk; every database saw every sample
+            searched_tags = {species: set(tag_to_file) for species in species_dbs}
+        elif args.combined_db:
+            # One search over one database answers every sample at once; the
+            # species label rides along on each hit's subject ID prefix
+            print(f"Running BLAST against combined database for {len(tag_to_file)} sample(s)...")
+            combined_hits = search_database(args.combined_db)
+        elif args.early_accept_threshold is not None:
+            # Early accept: search databases one at a time in the order given,
+            # and drop a sample from the query as soon as any database matches
+            # it at or above the threshold
+            per_species_hits = {}
+            remaining = dict(tag_to_file)
+            for species, db_path in species_dbs.items():
+                # Stop once every sample has a confident identification
+                if not remaining:
+                    break
+
+                # Inform the user which database is being searched
+                print(f"Running BLAST against {species} for {len(remaining)} sample(s)...")
+
+                # search_database re-merges only the unresolved (and uncached)
+                # samples itself
+                hits = search_database(db_path, remaining)
+
+                per_species_hits[species] = hits
+                searched_tags[species] = set(remaining)
+
+                # Retire samples whose hit already clears the threshold
+                for tag in list(remaining):
+                    identity, _ = parse_blast_result(hits.get(tag, ""))
+                    if identity is not None and identity >= args.early_accept_threshold:
+                        del remaining[tag]
+        else:
+            # Run the batched BLAST searches concurrently, one per database.
+            # Threads suffice here: the GIL is released while each subprocess runs
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = {}
                 for species, db_path in species_dbs.items():
-                    # Inform the user which species and sample are being processed
-                    print(f"Running BLAST for {fasta_file} against {species}...")
-
-                    # Run BLAST and parse the result for percent identity
-                    blast_result = run_blast(query_file, db_path)
-                    identity, _ = parse_blast_result(blast_result)
-
-                    # Store the identity and raw result for this species
-                    results[species] = (identity, blast_result)
-
-                # Filter out species with no valid hit (i.e., identity is None)
-                valid_results = {sp: data for sp, data in results.items() if data[0] is not None}
+                    # Inform the user which database is being searched
+                    print(f"Running BLAST against {species} for {len(tag_to_file)} sample(s)...")
+
+                    # One search invocation covers every sample in the merged query
+                    futures[species] = executor.submit(search_database, db_path)
+
+                # Collect the best-hit-per-sample mapping from each search
+                per_species_hits = {species: future.result() for species, future in futures.items()}
+
+            # Without early accept, every database saw every sample
+            searched_tags = {species: set(tag_to_file) for species in species_dbs}
+    finally:
+        # Delete the merged query file to clean up after ourselves
+        if merged_query is not None:
+            os.remove(merged_query)
+
+    # Open both output files for writing (will be overwritten if they exist).
+    # A 1 MiB buffer batches the many small writes below into far fewer
+    # write() syscalls than the default 8 KiB buffer would, which matters
+    # when the output directory lives on network storage. Binary mode also
+    # skips the TextIOWrapper encoding layer on every write
+    with open(summary_output_file, "wb", buffering=1024 * 1024) as summary_file, \
+            open(species_summary_file, "wb", buffering=1024 * 1024) as species_file:
+        # Write headers to the summary file
+        summary_file.write(b"BLAST Summary Results\n=====================\n\n")
+        summary_file.write(b"Query ID\tSubject ID\t% Identity\tAlignment Length\tMismatches\tGap Openings\tQuery Start\tQuery End\tSubject Start\tSubject End\tE-value\tBit Score\n")
 
-                # If no valid BLAST hits found in any species database
-                if not valid_results:
-                    species_file.write(f"{fasta_file}\tNo Match\tN/A\n")
+        # Write headers to the species identification summary file
+        species_file.write(b"Sample ID\tSpecies Identified\tPercent Identity\n")
+
+        # Loop through each sample and reconstruct its per-species results
+        for tag, fasta_file in tag_to_file.items():
+            # Combined-database mode: the single best hit decides everything,
+            # with the species read off the subject ID's 'species|' prefix
+            if combined_hits is not None:
+                hit_line = combined_hits.get(tag)
+                identity, subject_id = parse_blast_result(hit_line + "\n" if hit_line else "")
+
+                # If no valid BLAST hit was found in the combined database
+                if identity is None:
+                    species_file.write(f"{fasta_file}\tNo Match\tN/A\n".encode())
                     continue  # Skip to next sample
 
-                # Identify the species with the highest percent identity match
-                top_species, (top_identity, _) = max(valid_results.items(), key=lambda x: x[1][0])
-
                 # Write top hit info to species summary file
-                species_file.write(f"{fasta_file}\t{top_species}\t{top_identity:.3f}\n")
-
-                # Write full BLAST output for each species to the summary file
-                for species, (_, blast_output) in results.items():
-                    summary_file.write(f"Results for {fasta_file} ({species}):\n{blast_output}\n")
+                species = subject_id.partition("|")[0]
+                species_file.write(f"{fasta_file}\t{species}\t{identity:.3f}\n".encode())
 
-                # Notify user that the sample has been processed
-                print(f"Completed BLAST for {fasta_file}")
+                # Write the hit to the summary file in one batched write
+                summary_file.write(f"Results for {fasta_file} (combined):\n{hit_line}\n\n".encode())
 
                 # increment the sample count
                 sample_count += 1
+                continue
+
+            # Dictionary to store BLAST results for all species for this sample
+            results = {}
+            for species in species_dbs:
+                # Databases this sample never reached (early accept) are
+                # marked as skipped rather than treated as "no hit"
+                if tag not in searched_tags.get(species, ()):
+                    results[species] = (None, "Skipped (early accept)\n")
+                    continue
+
+                # Pull this sample's best hit line out of the batched output
+                hit_line = per_species_hits[species].get(tag)
+                # Re-add the trailing newline the per-sample output used to have
+                blast_result = hit_line + "\n" if hit_line else ""
+
+                # Parse the result for percent identity
+                identity, _ = parse_blast_result(blast_result)
+
+                # Store the identity and raw result for this species
+                results[species] = (identity, blast_result)
+
+            # Identify the species with the highest percent identity match in
+            # a single pass, skipping species with no valid hit; no filtered
+            # intermediate dict, no key-lambda call per comparison
+            top_species = None
+            top_identity = 0.0
+            for species, (identity, _) in results.items():
+                if identity is not None and (top_species is None or identity > top_identity):
+                    top_species, top_identity = species, identity
+
+            # If no valid BLAST hits found in any species database
+            if top_species is None:
+                species_file.write(f"{fasta_file}\tNo Match\tN/A\n".encode())
+                continue  # Skip to next sample
+
+            # Write top hit info to species summary file
+            species_file.write(f"{fasta_file}\t{top_species}\t{top_identity:.3f}\n".encode())
+
+            # Batch this sample's whole summary section into a single buffer
+            # and one write call, instead of several small encoded writes
+            section = bytearray()
+            for species, (_, blast_output) in results.items():
+                section += f"Results for {fasta_file} ({species}):\n".encode()
+                section += blast_output.encode()
+                section += b"\n"
+            summary_file.write(section)
+
+            # increment the sample count
+            sample_count += 1
 
     end_time = time.time()
     total_time = end_time - start_time